@@ -2,16 +2,31 @@ import os
 import io
 import csv
 import json
+import re
 import base64
+import shutil
+import hashlib
 import logging
+import zipfile
+import time
+import uuid
+import tempfile
+import functools
+import threading
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple, Optional
 
 from flask import (
-    Flask, render_template, request, jsonify, send_file, session
+    Flask, Response, render_template, request, jsonify, send_file, session,
+    stream_with_context,
 )
 from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import (
+    ArrayObject, ByteStringObject, DecodedStreamObject, DictionaryObject, IndirectObject,
+    NameObject,
+)
 from openpyxl import Workbook
+from openpyxl.writer.excel import ExcelWriter
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
@@ -20,6 +35,11 @@ from reportlab.lib.units import inch
 logging.getLogger("PyPDF2").setLevel(logging.CRITICAL)
 logging.getLogger("PyPDF2").propagate = False
 
+try:
+    import fcntl
+except ImportError:  # Windows dev server: single process, thread lock is enough
+    fcntl = None
+
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "montebello-transit-ot-2026")
 
@@ -28,61 +48,37 @@ DEPT_CODE = "910"
 DATE_FMT_OUTPUT = "%m-%d-%y"
 PAGE_W, PAGE_H = letter  # 612 x 792
 
-with open(TEMPLATE_PDF, "rb") as _f:
-    _TEMPLATE_BYTES = _f.read()
+DEFAULT_TEMPLATE = "p-r-107"
+# Byte-identical PDFs/XLSX for identical input (pinned IDs and dates) so output
+# can be content-hashed, ETagged and deduplicated. Requests can also opt in
+# with "deterministic": true.
+DETERMINISTIC_OUTPUT = os.environ.get("OT_DETERMINISTIC_OUTPUT", "") == "1"
+LAYOUT_CACHE_DIR = os.environ.get(
+    "OT_LAYOUT_CACHE", os.path.join(os.path.dirname(__file__), ".layout_cache")
+)
+LAYOUT_VERSION = 1
 
 # ---------------------------------------------------------------------------
-# Field coordinate map (extracted from PDF annotations)
-# Each entry: (x, y, w, h, font_size, align)
+# Field styles
+# Field geometry is compiled from the template's widget annotations (see
+# Template layouts below). The form leaves font size on auto, so the sizes we
+# print at live here. Each entry: (font_size, align)
 #   align: "left" or "center"
 # ---------------------------------------------------------------------------
-FIELD_COORDS = {
-    "Employee Name": (99.00, 711.72, 201.60, 16.92, 11, "left"),
-    "Dept":          (345.84, 711.72, 45.60, 16.92, 11, "center"),
-    "Ending Date":   (459.24, 711.72, 104.76, 16.92, 10, "left"),
-    "Employee":      (76.32, 681.36, 65.52, 16.92, 10, "left"),
+FIELD_STYLES = {
+    "Employee Name": (11, "left"),
+    "Dept":          (11, "center"),
+    "Ending Date":   (10, "left"),
+    "Employee":      (10, "left"),
 
     # OT date columns (rows 1-5)
-    "Dates 1_2": (18.48, 365.16, 80.76, 16.92, 7, "left"),
-    "Dates 2_2": (18.48, 347.04, 80.76, 16.92, 7, "left"),
-    "Dates 3_2": (18.48, 328.92, 80.76, 16.92, 7, "left"),
-    "Dates 4_2": (18.48, 310.80, 80.76, 16.92, 7, "left"),
-    "Dates 5_2": (18.48, 292.68, 80.76, 16.92, 7, "left"),
-
-    # OT 1.0 (rows 1-5 + total row 6)
-    "OT1": (143.64, 366.78, 18.33, 15.30, 7, "center"),
-    "OT2": (143.64, 348.66, 18.33, 15.30, 7, "center"),
-    "OT3": (143.64, 330.54, 18.33, 15.30, 7, "center"),
-    "OT4": (143.64, 312.42, 18.33, 15.30, 7, "center"),
-    "OT5": (143.64, 294.30, 18.33, 15.30, 7, "center"),
-    "OT6": (143.64, 275.58, 18.33, 15.30, 7, "center"),
-
-    # OT 1.5 (rows 1-5 + total row 6)
-    "OTH1": (166.31, 366.78, 18.33, 15.30, 7, "center"),
-    "OTH2": (166.31, 348.66, 18.33, 15.30, 7, "center"),
-    "OTH3": (166.31, 330.54, 18.33, 15.30, 7, "center"),
-    "OTH4": (166.31, 312.42, 18.33, 15.30, 7, "center"),
-    "OTH5": (166.31, 294.30, 18.33, 15.30, 7, "center"),
-    "OTH6": (166.31, 275.58, 18.33, 15.30, 7, "center"),
-
-    # CTE 1.0 (rows 1-5 + total row 6)
-    "CTE1": (189.05, 366.78, 18.33, 15.30, 7, "center"),
-    "CTE2": (189.05, 348.66, 18.33, 15.30, 7, "center"),
-    "CTE3": (189.05, 330.54, 18.33, 15.30, 7, "center"),
-    "CTE4": (189.05, 312.42, 18.33, 15.30, 7, "center"),
-    "CTE5": (189.05, 294.30, 18.33, 15.30, 7, "center"),
-    "CTE6": (189.05, 275.58, 18.33, 15.30, 7, "center"),
-
-    # CTE 1.5 (rows 1-5 + total row 6)
-    "CTEH1": (211.98, 366.78, 18.33, 15.30, 7, "center"),
-    "CTEH2": (211.98, 348.66, 18.33, 15.30, 7, "center"),
-    "CTEH3": (211.98, 330.54, 18.33, 15.30, 7, "center"),
-    "CTEH4": (211.98, 312.42, 18.33, 15.30, 7, "center"),
-    "CTEH5": (211.98, 294.30, 18.33, 15.30, 7, "center"),
-    "CTEH6": (211.98, 275.58, 18.33, 15.30, 7, "center"),
+    **{f"Dates {i}_2": (7, "left") for i in range(1, 6)},
+
+    # OT 1.0 / OT 1.5 / CTE 1.0 / CTE 1.5 (rows 1-5 + total row 6)
+    **{f"{prefix}{i}": (7, "center") for prefix in ("OT", "OTH", "CTE", "CTEH") for i in range(1, 7)},
 
     # Grand total hours
-    "HTOT1": (302.43, 275.58, 18.33, 15.30, 7, "center"),
+    "HTOT1": (7, "center"),
 }
 
 OT_ROW_FIELDS = {
@@ -102,12 +98,138 @@ OT_TOTAL_FIELDS = {
 
 HOURS_TOTAL_FIELD = "HTOT1"
 
+# ---------------------------------------------------------------------------
+# Template layouts
+# ---------------------------------------------------------------------------
+# Each template PDF is compiled once into {field: (font_size, align, text_x,
+# text_y)} from its /Widget annotations, so drawing a slip is a dict lookup
+# per field. Compiled layouts are cached on disk by the template's SHA-256;
+# a revised form gets a new hash and is recompiled on the next start.
+
+_QUADDING = {0: "left", 1: "center", 2: "right"}
+
+
+def _field_style(name: str, annot, height: float) -> Tuple[float, str]:
+    if name in FIELD_STYLES:
+        return FIELD_STYLES[name]
+    da = str(annot.get("/DA", "") or "")
+    m = re.search(r"([\d.]+)\s+Tf", da)
+    font_size = float(m.group(1)) if m else 0.0
+    if font_size <= 0:  # auto-size: fit the box with a little breathing room
+        font_size = round(min(height * 0.65, 11), 1)
+    return font_size, _QUADDING.get(int(annot.get("/Q", 0) or 0), "left")
+
+
+def compile_layout(template_bytes: bytes) -> Dict[str, tuple]:
+    """Read the first page's widget annotations into precomputed text positions."""
+    page = PdfReader(io.BytesIO(template_bytes)).pages[0]
+    fields = {}
+    annots = page.get("/Annots")
+    for ref in (annots.get_object() if annots is not None else []):
+        annot = ref.get_object()
+        if annot.get("/Subtype") != "/Widget":
+            continue
+        name = annot.get("/T")
+        if name is None and "/Parent" in annot:
+            name = annot["/Parent"].get_object().get("/T")
+        if name is None or str(annot.get("/FT", "")) not in ("/Tx", ""):
+            continue
+        x1, y1, x2, y2 = (float(v) for v in annot["/Rect"])
+        x, y, w, h = min(x1, x2), min(y1, y2), abs(x2 - x1), abs(y2 - y1)
+        font_size, align = _field_style(str(name), annot, h)
+
+        text_y = y + (h - font_size) / 2 + 1  # vertically center
+        if align == "center":
+            text_x = x + w / 2
+        elif align == "right":
+            text_x = x + w - 2
+        else:
+            text_x = x + 2  # small left padding
+        fields[str(name)] = (font_size, align, round(text_x, 3), round(text_y, 3))
+    return fields
+
+
+def _styles_fingerprint() -> str:
+    return hashlib.sha256(json.dumps(FIELD_STYLES, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def load_template(path: str) -> dict:
+    """Load a template PDF with its compiled layout, using the disk cache."""
+    with open(path, "rb") as f:
+        template_bytes = f.read()
+    digest = hashlib.sha256(template_bytes).hexdigest()
+    cache_path = os.path.join(LAYOUT_CACHE_DIR, f"{digest}.json")
+    stamp = {"version": LAYOUT_VERSION, "styles": _styles_fingerprint()}
+
+    fields = None
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+        if cached.get("stamp") == stamp:
+            fields = {k: tuple(v) for k, v in cached["fields"].items()}
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if fields is None:
+        fields = compile_layout(template_bytes)
+        try:
+            os.makedirs(LAYOUT_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"stamp": stamp, "source": os.path.basename(path), "fields": fields}, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            app.logger.warning(f"Could not cache layout for {path}: {e}")
+
+    return {"bytes": template_bytes, "hash": digest, "fields": fields}
+
+
+def _template_paths() -> Dict[str, str]:
+    """Built-in Form P/R-107 plus any OT_EXTRA_TEMPLATES ("name=path,name=path")."""
+    paths = {DEFAULT_TEMPLATE: TEMPLATE_PDF}
+    for item in os.environ.get("OT_EXTRA_TEMPLATES", "").split(","):
+        name, sep, path = item.partition("=")
+        if sep and name.strip() and path.strip():
+            paths[name.strip()] = path.strip()
+    return paths
+
+
+def _load_templates() -> Dict[str, dict]:
+    templates = {}
+    for name, path in _template_paths().items():
+        if name == DEFAULT_TEMPLATE:
+            templates[name] = load_template(path)
+            continue
+        # A mistyped extra template shouldn't keep the whole app from starting
+        try:
+            templates[name] = load_template(path)
+        except Exception as e:
+            app.logger.error(f"Skipping template {name!r} ({path}): {e}")
+    return templates
+
+
+TEMPLATES = _load_templates()
+
+
+def get_template(name: Optional[str]) -> dict:
+    if not name:
+        return TEMPLATES[DEFAULT_TEMPLATE]
+    if name not in TEMPLATES:
+        raise ValueError(f"Unknown template: {name}")
+    return TEMPLATES[name]
+
 # ---------------------------------------------------------------------------
 # Utility helpers
 # ---------------------------------------------------------------------------
 
 def parse_date_flexible(s: str) -> datetime:
     s = s.strip()
+    # Browser date inputs send ISO dates; fromisoformat is far cheaper than strptime
+    if len(s) == 10 and s[4] == "-" and s[7] == "-":
+        try:
+            return datetime.fromisoformat(s)
+        except ValueError:
+            pass
     for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%m/%d/%y", "%m-%d-%y"):
         try:
             return datetime.strptime(s, fmt)
@@ -172,32 +294,47 @@ def parse_employees_from_csv(file_bytes: bytes) -> List[Dict[str, str]]:
 # PDF generation
 # ---------------------------------------------------------------------------
 
-def _create_overlay(values: dict) -> bytes:
-    """Create a transparent PDF overlay with text drawn at field coordinates."""
+def _input_digest(*parts) -> bytes:
+    h = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = json.dumps(part, sort_keys=True, separators=(",", ":"), default=str).encode()
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.digest()
+
+
+def _pin_document_id(writer: PdfWriter, digest: bytes):
+    """Give the output a trailer /ID derived from its input instead of none/random."""
+    doc_id = ByteStringObject(digest[:16])
+    writer._ID = ArrayObject([doc_id, doc_id])
+
+
+def _create_overlay(values: dict, fields: Dict[str, tuple], deterministic: bool = False) -> bytes:
+    """Create a transparent PDF overlay with text drawn at compiled field positions."""
     buf = io.BytesIO()
-    c = canvas.Canvas(buf, pagesize=letter)
+    # invariant pins ReportLab's creation date and derives its /ID from the content
+    c = canvas.Canvas(buf, pagesize=letter, invariant=1 if deterministic else None)
 
     for field_name, text in values.items():
-        if not text or field_name not in FIELD_COORDS:
+        if not text or field_name not in fields:
             continue
-        x, y, w, h, font_size, align = FIELD_COORDS[field_name]
+        font_size, align, text_x, text_y = fields[field_name]
 
         c.setFont("Helvetica", font_size)
-        text_y = y + (h - font_size) / 2 + 1  # vertically center
-
         if align == "center":
-            text_x = x + w / 2
             c.drawCentredString(text_x, text_y, str(text))
+        elif align == "right":
+            c.drawRightString(text_x, text_y, str(text))
         else:
-            text_x = x + 2  # small left padding
             c.drawString(text_x, text_y, str(text))
 
     c.save()
     return buf.getvalue()
 
 
-def fill_single_pdf(employee: dict, pp_end: str, ot_data: dict = None) -> bytes:
-    """Fill a single Time Exception Slip PDF using a reportlab text overlay."""
+def _slip_values(employee: dict, pp_end: str, ot_data: dict = None) -> dict:
+    """Field name -> text for one employee's slip."""
     combined_name = f"{employee['last']}, {employee['first']}".strip(", ").strip()
     end_dt = parse_date_flexible(pp_end)
     pp_end_formatted = end_dt.strftime(DATE_FMT_OUTPUT)
@@ -239,14 +376,32 @@ def fill_single_pdf(employee: dict, pp_end: str, ot_data: dict = None) -> bytes:
         if grand_total > 0:
             values[HOURS_TOTAL_FIELD] = _fmt_hours(grand_total)
 
-    overlay_bytes = _create_overlay(values)
+    return values
+
+
+def fill_single_pdf(employee: dict, pp_end: str, ot_data: dict = None, template: dict = None,
+                    deterministic: bool = False) -> bytes:
+    """Fill a single Time Exception Slip PDF using a reportlab text overlay."""
+    template = template or TEMPLATES[DEFAULT_TEMPLATE]
+    values = _slip_values(employee, pp_end, ot_data)
+    return _render_slip(template, values, _create_overlay(values, template["fields"], deterministic),
+                        deterministic)
+
 
-    template_reader = PdfReader(io.BytesIO(_TEMPLATE_BYTES))
+def _render_slip(template: dict, values: dict, overlay_bytes: bytes, deterministic: bool = False) -> bytes:
+    template_reader = PdfReader(io.BytesIO(template["bytes"]))
     overlay_reader = PdfReader(io.BytesIO(overlay_bytes))
 
     template_page = template_reader.pages[0]
     overlay_page = overlay_reader.pages[0]
     template_page.merge_page(overlay_page)
+    # merge_page builds /ProcSet from a set, so its order follows the hash
+    # seed (which differs per worker); sort it so the bytes don't.
+    resources = template_page["/Resources"].get_object()
+    if "/ProcSet" in resources:
+        resources[NameObject("/ProcSet")] = ArrayObject(
+            sorted(resources["/ProcSet"].get_object(), key=str)
+        )
 
     # Strip form field annotations to prevent name collisions when merging
     # multiple copies into a single binder PDF. Text is drawn via overlay.
@@ -255,12 +410,28 @@ def fill_single_pdf(employee: dict, pp_end: str, ot_data: dict = None) -> bytes:
 
     writer = PdfWriter()
     writer.add_page(template_page)
+    if deterministic:
+        _pin_document_id(writer, _input_digest(template["hash"], values))
 
     out = io.BytesIO()
     writer.write(out)
     return out.getvalue()
 
 
+def _parse_ot_entry(entry: dict) -> Tuple[datetime, str, float]:
+    """(date, category, hours) for one daily entry. Raises ValueError when the
+    date or hours are missing or malformed, e.g. a half-typed entry."""
+    try:
+        dt = parse_date_flexible(entry["date"])
+    except (KeyError, TypeError, AttributeError):
+        raise ValueError("Missing date")
+    try:
+        hours = round(float(entry.get("hours", 0)), 2)
+    except (TypeError, ValueError):
+        raise ValueError(f"Hours must be a number, got {entry.get('hours')!r}")
+    return dt, entry.get("category", ""), hours
+
+
 def _aggregate_ot_by_week(ot_data: dict, wk1_start, wk1_end, wk2_start, wk2_end) -> list:
     """Group OT entries into week 1 and week 2, summing hours by category.
     Optional weekBlocks: [{ week: 1|2, rangeText, ot10, ot15, cte10, cte15 }]
@@ -292,20 +463,18 @@ def _aggregate_ot_by_week(ot_data: dict, wk1_start, wk1_end, wk2_start, wk2_end)
                 w["has_data"] = True
                 w["row_total"] += h
 
+    pp_start = wk1_start - timedelta(days=7)
+    pp_limit = wk2_end + timedelta(days=1)
     entries = ot_data.get("entries", [])
     for entry in entries:
         try:
-            dt = parse_date_flexible(entry["date"])
+            dt, cat, hours = _parse_ot_entry(entry)
         except ValueError:
             continue
-
-        cat = entry.get("category", "")
-        hours = round(float(entry.get("hours", 0)), 2)
         if hours <= 0:
             continue
 
-        pp_start = wk1_start - timedelta(days=7)
-        if dt < pp_start or dt > wk2_end + timedelta(days=1):
+        if dt < pp_start or dt > pp_limit:
             continue
         if wk1_start <= dt <= wk1_end:
             week = weeks[0]
@@ -340,21 +509,241 @@ def _fmt_hours(h: float) -> str:
     return f"{round(h, 2):.2f}"
 
 
-def merge_pdfs(pdf_bytes_list: List[bytes]) -> bytes:
+def merge_pdfs(pdf_bytes_list: List[bytes], deterministic: bool = False) -> bytes:
     writer = PdfWriter()
     for pdf_bytes in pdf_bytes_list:
         reader = PdfReader(io.BytesIO(pdf_bytes))
         writer.add_page(reader.pages[0])
+    if deterministic:
+        _pin_document_id(writer, _input_digest(*(hashlib.sha256(b).digest() for b in pdf_bytes_list)))
     buf = io.BytesIO()
     writer.write(buf)
     return buf.getvalue()
 
 
+# ---------------------------------------------------------------------------
+# ZIP bundle export
+# ---------------------------------------------------------------------------
+
+class _PinnedTimeZipFile(zipfile.ZipFile):
+    """ZipFile that stamps every member written by name with one fixed
+    date_time instead of the current clock."""
+
+    def __init__(self, *args, date_time: tuple, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pinned_date_time = date_time
+
+    def _pinned_info(self, name) -> zipfile.ZipInfo:
+        if isinstance(name, zipfile.ZipInfo):
+            return name
+        info = zipfile.ZipInfo(name, date_time=self._pinned_date_time)
+        info.compress_type = self.compression
+        info.external_attr = 0o600 << 16
+        return info
+
+    def writestr(self, zinfo_or_arcname, data, compress_type=None, compresslevel=None):
+        super().writestr(self._pinned_info(zinfo_or_arcname), data, compress_type, compresslevel)
+
+    def open(self, name, mode="r", pwd=None, *, force_zip64=False):
+        if mode == "w":
+            name = self._pinned_info(name)
+        return super().open(name, mode, pwd, force_zip64=force_zip64)
+
+    def write(self, filename, arcname=None, compress_type=None, compresslevel=None):
+        # openpyxl streams worksheets through a temp file; don't pick up its mtime
+        info = zipfile.ZipInfo.from_file(filename, arcname)
+        info.date_time = self._pinned_date_time
+        info.external_attr = 0o600 << 16
+        info.compress_type = self.compression if compress_type is None else compress_type
+        with open(filename, "rb") as src, self.open(info, "w") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 64)
+
+
+def _pinned_date_time(pp_end: str) -> tuple:
+    """Pay period end at midnight — the date stamped on deterministic output."""
+    return parse_date_flexible(pp_end).timetuple()[:6]
+
+
+class _ZipStreamBuffer:
+    """Write-only sink for zipfile that hands back whatever was written since
+    the last drain. It has no tell/seek, so zipfile falls back to data
+    descriptors and never needs to rewind into bytes already sent."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _TellingWriter:
+    """Track the write position for PdfWriter, which records object offsets
+    via tell() but never seeks back."""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._pos = 0
+
+    def write(self, data) -> int:
+        self._raw.write(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+
+class _BinderWriter:
+    """Merged binder built from one shared template page. Each slip's overlay
+    is attached as a small Form XObject drawn after the template's content, so
+    the template's fonts and content streams are written once for the whole
+    binder rather than copied into every page."""
+
+    def __init__(self, template: dict):
+        self._writer = PdfWriter()
+        self._template_page = PdfReader(io.BytesIO(template["bytes"])).pages[0]
+        self._fonts = {}
+        self._push = self._stream(b"q\n")
+        self._pop_and_draw = self._stream(b"Q\nq /OTOverlay Do Q\n")
+
+    def _stream(self, data: bytes, **entries) -> IndirectObject:
+        stream = DecodedStreamObject()
+        stream.set_data(data)
+        stream = stream.flate_encode()
+        stream.update({NameObject(k): v for k, v in entries.items()})
+        return self._writer._add_object(stream)
+
+    def _shared_font(self, font) -> IndirectObject:
+        font = font.get_object()
+        key = json.dumps({str(k): str(v) for k, v in font.items()}, sort_keys=True)
+        if key not in self._fonts:
+            self._fonts[key] = self._writer._add_object(
+                DictionaryObject({NameObject(k): v for k, v in font.items()})
+            )
+        return self._fonts[key]
+
+    def add(self, overlay_bytes: bytes):
+        overlay_page = PdfReader(io.BytesIO(overlay_bytes)).pages[0]
+        fonts = overlay_page["/Resources"].get_object().get("/Font", DictionaryObject()).get_object()
+        form = self._stream(
+            overlay_page.get_contents().get_data(),
+            **{
+                "/Type": NameObject("/XObject"),
+                "/Subtype": NameObject("/Form"),
+                "/BBox": ArrayObject(overlay_page.mediabox),
+                "/Resources": DictionaryObject({NameObject("/Font"): DictionaryObject(
+                    {NameObject(k): self._shared_font(v) for k, v in fonts.items()}
+                )}),
+            },
+        )
+
+        page = self._writer.add_page(self._template_page, excluded_keys=("/Annots",))
+        resources = DictionaryObject(page["/Resources"].get_object())
+        xobjects = DictionaryObject(resources.get("/XObject", DictionaryObject()).get_object())
+        xobjects[NameObject("/OTOverlay")] = form
+        resources[NameObject("/XObject")] = xobjects
+        page[NameObject("/Resources")] = resources
+
+        contents = page.raw_get("/Contents")
+        if not isinstance(contents, ArrayObject):
+            contents = [contents]
+        page[NameObject("/Contents")] = ArrayObject([self._push, *contents, self._pop_and_draw])
+
+    def write(self, stream, digest: bytes = None):
+        if digest is not None:
+            _pin_document_id(self._writer, digest)
+        self._writer.write(stream)
+
+
+def _slip_filename(employee: dict) -> str:
+    emp_no = str(employee.get("emp_no", "") or "").strip()
+    if emp_no.startswith("__UM__"):
+        emp_no = ""
+    parts = [employee.get("last", ""), employee.get("first", ""), emp_no]
+    name = "_".join(str(p).strip() for p in parts if str(p).strip())
+    name = re.sub(r"[^A-Za-z0-9_-]+", "-", name).strip("-_")
+    return name or "employee"
+
+
+def stream_ot_bundle(emps_with_ot: list, pp_end: str, template: dict = None, deterministic: bool = False):
+    """Yield a ZIP containing one slip per employee, the merged binder and the
+    Excel summary. Members are written as they are produced; PDFs and the
+    xlsx (itself a zip) are stored rather than deflated again.
+
+    Only each slip's overlay (a few KB) is kept for the binder, spooled to a
+    temp file, so memory stays flat while the slips stream. The binder is then
+    built with _BinderWriter, sharing a single copy of the template."""
+    template = template or TEMPLATES[DEFAULT_TEMPLATE]
+    end_dt = parse_date_flexible(pp_end)
+    date_str = end_dt.strftime("%m-%d-%y")
+    sink = _ZipStreamBuffer()
+    spool = tempfile.TemporaryFile()
+    overlay_sizes = []
+    used_names = set()
+
+    if deterministic:
+        zf = _PinnedTimeZipFile(sink, mode="w", compression=zipfile.ZIP_STORED,
+                                date_time=_pinned_date_time(pp_end))
+    else:
+        zf = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+    binder_pages = []
+
+    with zf, spool:
+        for item in emps_with_ot:
+            try:
+                values = _slip_values(item["employee"], pp_end, item["ot_data"])
+                overlay_bytes = _create_overlay(values, template["fields"], deterministic)
+                pdf_bytes = _render_slip(template, values, overlay_bytes, deterministic)
+            except Exception as e:
+                app.logger.error(f"Error filling OT PDF for {item['employee']}: {e}")
+                continue
+
+            base = _slip_filename(item["employee"])
+            name = base
+            n = 2
+            while name in used_names:
+                name = f"{base}_{n}"
+                n += 1
+            used_names.add(name)
+
+            zf.writestr(f"slips/{name}.pdf", pdf_bytes)
+            spool.write(overlay_bytes)
+            overlay_sizes.append(len(overlay_bytes))
+            if deterministic:
+                binder_pages.append(hashlib.sha256(pdf_bytes).digest())
+            yield sink.drain()
+
+        binder = _BinderWriter(template)
+        spool.seek(0)
+        for size in overlay_sizes:
+            binder.add(spool.read(size))
+        with zf.open(f"Overtime_Slips_{date_str}.pdf", mode="w") as member:
+            # Laid out differently from merge_pdfs' binder, so it gets its own ID
+            binder.write(_TellingWriter(member),
+                         _input_digest("bundle-binder", *binder_pages) if deterministic else None)
+        binder = None
+        yield sink.drain()
+
+        zf.writestr(f"Overtime_Summary_{date_str}.xlsx", generate_ot_excel(emps_with_ot, pp_end, deterministic))
+        yield sink.drain()
+
+    yield sink.drain()
+
+
 # ---------------------------------------------------------------------------
 # Excel export
 # ---------------------------------------------------------------------------
 
-def generate_ot_excel(employees_with_ot: list, pp_end: str) -> bytes:
+def generate_ot_excel(employees_with_ot: list, pp_end: str, deterministic: bool = False) -> bytes:
     """Generate an Excel summary with stacked Wk1/Wk2 rows per employee."""
     wb = Workbook()
     ws = wb.active
@@ -493,10 +882,324 @@ def generate_ot_excel(employees_with_ot: list, pp_end: str) -> bytes:
         ws.column_dimensions[chr(64 + i)].width = w
 
     buf = io.BytesIO()
-    wb.save(buf)
+    if deterministic:
+        # wb.save() stamps "modified" with the clock and zip entries with now;
+        # write through ExcelWriter with everything pinned to the period end.
+        wb.properties.created = wb.properties.modified = end_dt
+        archive = _PinnedTimeZipFile(buf, "w", zipfile.ZIP_DEFLATED, allowZip64=True,
+                                     date_time=_pinned_date_time(pp_end))
+        ExcelWriter(wb, archive).save()
+    else:
+        wb.save(buf)
     return buf.getvalue()
 
 
+# ---------------------------------------------------------------------------
+# Flat exports (Finance ingestion)
+# ---------------------------------------------------------------------------
+# One row per employee / week / category with hours, written straight from
+# _aggregate_ot_by_week as each employee is reached. No workbook is built, so
+# these stay fast and flat in memory for rosters of thousands.
+
+OT_CATEGORIES = (
+    ("ot10", "OT 1.0", "OT10"),
+    ("ot15", "OT 1.5", "OT15"),
+    ("cte10", "CTE 1.0", "CTE10"),
+    ("cte15", "CTE 1.5", "CTE15"),
+)
+
+SUMMARY_FORMATS = {
+    # format: (extension, mimetype)
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("csv", "text/csv"),
+    "payroll": ("txt", "text/tab-separated-values"),
+}
+
+CSV_HEADER = ["Employee No", "Last Name", "First Name", "Week", "Week Start",
+              "Week End", "Category", "Hours", "Week Dates"]
+
+
+def _flat_rows(employees_with_ot: list, pp_end: str, payroll: bool):
+    (wk1_start, wk1_end), (wk2_start, wk2_end) = pay_period_weeks(pp_end)
+    bounds = ((wk1_start, wk1_end), (wk2_start, wk2_end))
+    pp_end_str = parse_date_flexible(pp_end).strftime("%m/%d/%Y")
+    week_strs = [(s.strftime("%m/%d/%Y"), e.strftime("%m/%d/%Y")) for s, e in bounds]
+
+    for emp_ot in employees_with_ot:
+        emp = emp_ot["employee"]
+        emp_no = str(emp.get("emp_no", "") or "").strip()
+        if emp_no.startswith("__UM__"):
+            emp_no = ""
+        if payroll and not emp_no:
+            continue  # no name column to trace it by; the route refuses these up front
+        weeks = _aggregate_ot_by_week(emp_ot["ot_data"], wk1_start, wk1_end, wk2_start, wk2_end)
+        for wk_idx, week in enumerate(weeks):
+            if not week["has_data"]:
+                continue
+            wk_start_str, wk_end_str = week_strs[wk_idx]
+            for cat_key, label, earn_code in OT_CATEGORIES:
+                hours = week[cat_key]
+                if hours <= 0:
+                    continue
+                if payroll:
+                    yield [emp_no, pp_end_str, wk_end_str, earn_code, _fmt_hours(hours), DEPT_CODE]
+                else:
+                    yield [emp_no, emp.get("last", ""), emp.get("first", ""), wk_idx + 1,
+                           wk_start_str, wk_end_str, label, _fmt_hours(hours), week["dates_str"]]
+
+
+def generate_ot_flat(employees_with_ot: list, pp_end: str, fmt: str = "csv") -> bytes:
+    """CSV (with header) or the tab-delimited payroll import layout (no header:
+    emp no, period end, week ending, earn code, hours, dept)."""
+    payroll = fmt == "payroll"
+    buf = io.StringIO()
+    if payroll:
+        writer = csv.writer(buf, delimiter="\t", lineterminator="\r\n", quoting=csv.QUOTE_NONE,
+                            escapechar="\\")
+    else:
+        writer = csv.writer(buf, lineterminator="\r\n")
+        writer.writerow(CSV_HEADER)
+    writer.writerows(_flat_rows(employees_with_ot, pp_end, payroll))
+    return buf.getvalue().encode("utf-8")
+
+
+def generate_ot_summary(employees_with_ot: list, pp_end: str, fmt: str = "xlsx",
+                        deterministic: bool = False) -> bytes:
+    if fmt == "xlsx":
+        return generate_ot_excel(employees_with_ot, pp_end, deterministic)
+    return generate_ot_flat(employees_with_ot, pp_end, fmt)
+
+
+# ---------------------------------------------------------------------------
+# Admission control
+# ---------------------------------------------------------------------------
+# Gunicorn runs several worker processes, so running jobs are tracked in a
+# small JSON ledger on local disk guarded by flock. Each job reserves an
+# estimated memory cost and one CPU slot. A request that doesn't fit waits in
+# a bounded queue for up to ADMISSION_WAIT_SECONDS, but only while that still
+# leaves a worker free for other traffic (a waiting request blocks its
+# worker); otherwise it gets a 429 straight away.
+
+def _available_cpus() -> int:
+    """CPUs this container may actually use. os.cpu_count() reports the
+    host's, so prefer a cgroup CPU quota (v2, then v1), then the affinity mask."""
+    for quota_path, period_path in (("/sys/fs/cgroup/cpu.max", None),
+                                    ("/sys/fs/cgroup/cpu/cpu.cfs_quota_us",
+                                     "/sys/fs/cgroup/cpu/cpu.cfs_period_us")):
+        try:
+            with open(quota_path) as f:
+                values = f.read().split()
+            if period_path:
+                with open(period_path) as f:
+                    values.append(f.read().strip())
+            quota, period = values[0], values[1]
+            if quota not in ("max", "-1"):
+                return max(1, int(quota) // int(period))
+        except (OSError, ValueError, IndexError):
+            continue
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not on macOS/Windows
+        return os.cpu_count() or 2
+
+
+MEMORY_BUDGET_MB = float(os.environ.get("OT_MEMORY_BUDGET_MB", "384"))
+CPU_SLOTS = int(os.environ.get("OT_CPU_SLOTS", str(_available_cpus())))
+MAX_QUEUE = int(os.environ.get("OT_MAX_QUEUE", "4"))
+# Requests gunicorn can serve at once (workers x threads). WEB_CONCURRENCY is
+# gunicorn's own default for --workers, so the Dockerfile sets it there.
+WORKER_SLOTS = int(os.environ.get("OT_WORKER_SLOTS", os.environ.get("WEB_CONCURRENCY", "2")))
+ADMISSION_WAIT_SECONDS = float(os.environ.get("OT_ADMISSION_WAIT", "10"))
+RETRY_AFTER_SECONDS = int(os.environ.get("OT_RETRY_AFTER", "5"))
+ADMISSION_LEDGER = os.environ.get(
+    "OT_ADMISSION_LEDGER", os.path.join(tempfile.gettempdir(), "ot_admission.json")
+)
+
+# Per-request memory, from peak RSS at 40 vs 200 employees. Blank slips hold
+# every ~190 KB slip in pdf_list plus the merged binder (~1.1 MB per slip
+# once PyPDF2's object graph is counted); OT adds the base64 JSON copy
+# (~1.6 MB). The ZIP bundle streams slips out and keeps only a shared-template
+# binder, so it is mostly a fixed cost. Spreadsheets expand to roughly 10-15x
+# their file size once parsed.
+BASE_JOB_COST_MB = 8.0
+SLIP_COST_MB = 1.1
+OT_SLIP_COST_MB = 1.65
+BUNDLE_BASE_COST_MB = 14.0
+BUNDLE_SLIP_COST_MB = 0.03
+IMPORT_COST_FACTOR = 15
+
+_ledger_lock = threading.Lock()
+
+
+def _server_instance() -> str:
+    """Identify the gunicorn master this worker belongs to. The ledger in /tmp
+    survives a container restart, and worker PIDs often come back the same,
+    so entries are also stamped with the kernel boot id and the master's
+    start time; anything from an earlier run is dropped."""
+    ppid = os.getppid()
+    parts = [str(ppid)]
+    for path, pick in (("/proc/sys/kernel/random/boot_id", lambda text: text.strip()),
+                       # starttime is field 22 of stat, the 20th after "(comm)"
+                       (f"/proc/{ppid}/stat", lambda text: text.rsplit(")", 1)[1].split()[19])):
+        try:
+            with open(path) as f:
+                parts.append(pick(f.read()))
+        except (OSError, IndexError):
+            pass
+    return ":".join(parts)
+
+
+SERVER_INSTANCE = _server_instance()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _update_ledger(fn):
+    """Run fn(ledger) under an exclusive lock and persist the result."""
+    with _ledger_lock:
+        fd = os.open(ADMISSION_LEDGER, os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, "r+") as fh:
+            if fcntl:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                try:
+                    ledger = json.loads(fh.read() or "{}")
+                except ValueError:
+                    ledger = {}
+                running = ledger.setdefault("running", {})
+                waiting = ledger.setdefault("waiting", {})
+                # Drop jobs whose worker died (e.g. gunicorn timeout kill) or
+                # that were left over from before a restart
+                for jobs in (running, waiting):
+                    for token in [t for t, j in jobs.items()
+                                  if j.get("instance") != SERVER_INSTANCE or not _pid_alive(j["pid"])]:
+                        del jobs[token]
+                result = fn(ledger)
+                fh.seek(0)
+                fh.truncate()
+                fh.write(json.dumps(ledger))
+                fh.flush()
+                return result
+            finally:
+                if fcntl:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def queue_status() -> dict:
+    def read(ledger):
+        running = ledger["running"]
+        return {
+            "running": len(running),
+            "waiting": len(ledger["waiting"]),
+            "memoryUsedMb": round(sum(j["mem_mb"] for j in running.values()), 1),
+            "memoryBudgetMb": MEMORY_BUDGET_MB,
+            "cpuSlots": CPU_SLOTS,
+        }
+    return _update_ledger(read)
+
+
+def _try_admit(token: str, cost_mb: float) -> str:
+    """Returns "admitted", "waiting" or "rejected"."""
+    def op(ledger):
+        running, waiting = ledger["running"], ledger["waiting"]
+        used = sum(j["mem_mb"] for j in running.values())
+        fits = len(running) < CPU_SLOTS and (not running or used + cost_mb <= MEMORY_BUDGET_MB)
+        # First come, first served: nobody jumps ahead of an older waiter
+        ahead = [t for t, j in waiting.items()
+                 if t != token and j["since"] < waiting.get(token, {}).get("since", float("inf"))]
+        if fits and not ahead:
+            waiting.pop(token, None)
+            running[token] = {"pid": os.getpid(), "instance": SERVER_INSTANCE,
+                              "mem_mb": cost_mb, "since": time.time()}
+            return "admitted"
+        if token not in waiting:
+            # Waiting ties up this worker; only do it if one stays free
+            if len(waiting) >= MAX_QUEUE or len(running) + len(waiting) + 1 >= WORKER_SLOTS:
+                return "rejected"
+            waiting[token] = {"pid": os.getpid(), "instance": SERVER_INSTANCE,
+                              "mem_mb": cost_mb, "since": time.time()}
+        return "waiting"
+    return _update_ledger(op)
+
+
+def _release(token: str):
+    def op(ledger):
+        ledger["running"].pop(token, None)
+        ledger["waiting"].pop(token, None)
+    _update_ledger(op)
+
+
+def _admit(cost_mb: float) -> Optional[str]:
+    """Block until the job fits the budget. Returns a token, or None if it
+    can't wait (queue full, no spare worker) or the wait timed out."""
+    # A job bigger than the whole budget still runs, just on its own
+    cost_mb = min(cost_mb, MEMORY_BUDGET_MB)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + ADMISSION_WAIT_SECONDS
+    while True:
+        outcome = _try_admit(token, cost_mb)
+        if outcome == "admitted":
+            return token
+        if outcome == "rejected" or time.monotonic() >= deadline:
+            _release(token)
+            return None
+        time.sleep(0.25)
+
+
+def admission_controlled(estimate_mb):
+    """Route decorator: reserve estimate_mb() before running the view and free
+    it when the response is done (after the last chunk for streamed ones)."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            token = _admit(estimate_mb())
+            if token is None:
+                resp = jsonify({
+                    "error": "Server is busy with other requests — try again in a few seconds.",
+                    "queue": queue_status(),
+                })
+                resp.status_code = 429
+                resp.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+                return resp
+            try:
+                resp = app.make_response(view(*args, **kwargs))
+            except Exception:
+                _release(token)
+                raise
+            # send_file bodies are already built (and werkzeug skips close
+            # callbacks for direct passthrough), so only generators hold on
+            if resp.is_streamed and not resp.direct_passthrough:
+                resp.call_on_close(lambda: _release(token))
+            else:
+                _release(token)
+            return resp
+        return wrapper
+    return decorator
+
+
+def _roster_estimator(slip_cost_mb: float, base_cost_mb: float = BASE_JOB_COST_MB):
+    """Cost estimator for roster jobs: a fixed base plus slip_cost_mb per slip."""
+    def estimate() -> float:
+        data = request.get_json(silent=True) or {}
+        ot_entries = data.get("otEntries")
+        count = len(ot_entries) if ot_entries else len(data.get("employees", []))
+        return base_cost_mb + count * slip_cost_mb
+    return estimate
+
+
+def _estimate_import_job() -> float:
+    size_mb = (request.content_length or 0) / (1024 * 1024)
+    return BASE_JOB_COST_MB + size_mb * IMPORT_COST_FACTOR
+
+
 # ---------------------------------------------------------------------------
 # Routes
 # ---------------------------------------------------------------------------
@@ -506,6 +1209,11 @@ def index():
     return render_template("index.html")
 
 
+@app.route("/api/queue")
+def queue():
+    return jsonify(queue_status())
+
+
 @app.route("/api/parse-csv", methods=["POST"])
 def parse_csv():
     if "file" not in request.files:
@@ -524,6 +1232,7 @@ def parse_csv():
 
 
 @app.route("/api/generate-slips", methods=["POST"])
+@admission_controlled(_roster_estimator(SLIP_COST_MB))
 def generate_slips():
     """Feature 1: Generate pre-filled blank slips for all employees."""
     data = request.get_json()
@@ -532,13 +1241,18 @@ def generate_slips():
 
     if not employees or not pp_end:
         return jsonify({"error": "Missing employees or pay period end date"}), 400
+    try:
+        template = get_template(data.get("template"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    deterministic = DETERMINISTIC_OUTPUT or bool(data.get("deterministic"))
 
     employees.sort(key=lambda e: (e["last"].lower(), e["first"].lower()))
 
     pdf_list = []
     for emp in employees:
         try:
-            pdf_bytes = fill_single_pdf(emp, pp_end)
+            pdf_bytes = fill_single_pdf(emp, pp_end, template=template, deterministic=deterministic)
             pdf_list.append(pdf_bytes)
         except Exception as e:
             app.logger.error(f"Error filling PDF for {emp}: {e}")
@@ -547,7 +1261,7 @@ def generate_slips():
     if not pdf_list:
         return jsonify({"error": "No PDFs generated"}), 500
 
-    merged = merge_pdfs(pdf_list)
+    merged = merge_pdfs(pdf_list, deterministic)
     end_dt = parse_date_flexible(pp_end)
 
     return send_file(
@@ -751,6 +1465,7 @@ def parse_corrections_spreadsheet(file_bytes: bytes, filename: str, employees: L
 
 
 @app.route("/api/import-corrections", methods=["POST"])
+@admission_controlled(_estimate_import_job)
 def import_corrections():
     """Parse OPS CORRECTIONS spreadsheet and return OT entries to add to state."""
     if "file" not in request.files:
@@ -774,17 +1489,9 @@ def import_corrections():
     return jsonify({"entries": entries, "unmatched": unmatched})
 
 
-@app.route("/api/generate-overtime", methods=["POST"])
-def generate_overtime():
-    """Feature 2: Generate OT-filled slips + Excel for employees with OT data."""
-    data = request.get_json()
-    employees_all = data.get("employees", [])
-    pp_end = data.get("payPeriodEnd", "")
-    ot_entries = data.get("otEntries", {})  # keyed by emp_no
-
-    if not pp_end:
-        return jsonify({"error": "Missing pay period end date"}), 400
-
+def _collect_employees_with_ot(employees_all: list, ot_entries: dict) -> list:
+    """Pair each employee with their OT bundle, skipping duplicates and
+    employees with nothing entered. Sorted A-Z by last name."""
     seen_emp_nos = set()
     emps_with_ot = []
     for emp in employees_all:
@@ -798,33 +1505,206 @@ def generate_overtime():
             seen_emp_nos.add(emp_no)
             emps_with_ot.append({"employee": emp, "ot_data": bundle})
 
+    emps_with_ot.sort(key=lambda x: (x["employee"]["last"].lower(), x["employee"]["first"].lower()))
+    return emps_with_ot
+
+
+@app.route("/api/generate-overtime", methods=["POST"])
+@admission_controlled(_roster_estimator(OT_SLIP_COST_MB))
+def generate_overtime():
+    """Feature 2: Generate OT-filled slips + Excel for employees with OT data."""
+    data = request.get_json()
+    employees_all = data.get("employees", [])
+    pp_end = data.get("payPeriodEnd", "")
+    ot_entries = data.get("otEntries", {})  # keyed by emp_no
+
+    if not pp_end:
+        return jsonify({"error": "Missing pay period end date"}), 400
+
+    try:
+        template = get_template(data.get("template"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    deterministic = DETERMINISTIC_OUTPUT or bool(data.get("deterministic"))
+    summary_format = str(data.get("summaryFormat") or "xlsx").lower()
+    if summary_format not in SUMMARY_FORMATS:
+        return jsonify({"error": f"Unknown summary format: {summary_format}"}), 400
+
+    emps_with_ot = _collect_employees_with_ot(employees_all, ot_entries)
     if not emps_with_ot:
         return jsonify({"error": "No overtime entries found"}), 400
 
-    emps_with_ot.sort(key=lambda x: (x["employee"]["last"].lower(), x["employee"]["first"].lower()))
+    if summary_format == "payroll":
+        # The payroll layout is keyed on employee # alone, so hours for an
+        # unmatched import name could never be traced back to anyone
+        no_emp_no = [
+            f"{item['employee'].get('last', '')}, {item['employee'].get('first', '')}".strip(", ").strip()
+            for item in emps_with_ot
+            if not str(item["employee"].get("emp_no", "") or "").strip()
+            or str(item["employee"].get("emp_no")).startswith("__UM__")
+        ]
+        if no_emp_no:
+            return jsonify({
+                "error": "Payroll import needs an employee # on every row. Match these names to the roster first: "
+                         + "; ".join(no_emp_no),
+                "unmatched": no_emp_no,
+            }), 400
 
     pdf_list = []
     for item in emps_with_ot:
         try:
-            pdf_bytes = fill_single_pdf(item["employee"], pp_end, item["ot_data"])
+            pdf_bytes = fill_single_pdf(item["employee"], pp_end, item["ot_data"], template, deterministic)
             pdf_list.append(pdf_bytes)
         except Exception as e:
             app.logger.error(f"Error filling OT PDF for {item['employee']}: {e}")
             continue
 
-    merged_pdf = merge_pdfs(pdf_list)
-    excel_bytes = generate_ot_excel(emps_with_ot, pp_end)
+    merged_pdf = merge_pdfs(pdf_list, deterministic)
+    summary_bytes = generate_ot_summary(emps_with_ot, pp_end, summary_format, deterministic)
 
     end_dt = parse_date_flexible(pp_end)
     date_str = end_dt.strftime("%m-%d-%y")
+    ext, mimetype = SUMMARY_FORMATS[summary_format]
+    summary_b64 = base64.b64encode(summary_bytes).decode("ascii")
+    summary_name = f"Overtime_Summary_{date_str}.{ext}"
+    if summary_format == "payroll":
+        summary_name = f"Overtime_Payroll_Import_{date_str}.{ext}"
 
-    return jsonify({
+    result = {
         "pdf": base64.b64encode(merged_pdf).decode("ascii"),
         "pdfFilename": f"Overtime_Slips_{date_str}.pdf",
-        "excel": base64.b64encode(excel_bytes).decode("ascii"),
-        "excelFilename": f"Overtime_Summary_{date_str}.xlsx",
+        "summary": summary_b64,
+        "summaryFilename": summary_name,
+        "summaryMimetype": mimetype,
+    }
+    if summary_format == "xlsx":
+        result["excel"] = summary_b64
+        result["excelFilename"] = summary_name
+    return jsonify(result)
+
+
+def _check_entries(ot_data: dict, wk1_start, wk2_end) -> Tuple[List[str], List[dict]]:
+    """Split out daily entries worth a second look before printing: dates
+    outside the two pay-period weeks (_aggregate_ot_by_week folds near misses
+    into the closest week and drops the rest), and entries it skips outright
+    because the date, hours or category can't be read."""
+    out_of_period = set()
+    invalid = []
+    for idx, entry in enumerate(ot_data.get("entries", [])):
+        try:
+            dt, cat, _hours = _parse_ot_entry(entry)
+        except ValueError as e:
+            raw = entry.get("date") if isinstance(entry, dict) else None
+            invalid.append({"index": idx, "date": str(raw or ""), "reason": str(e)})
+            continue
+        if cat not in OT_TOTAL_FIELDS:
+            invalid.append({"index": idx, "date": dt.strftime("%Y-%m-%d"), "reason": f"Unknown category: {cat}"})
+            continue
+        if dt < wk1_start or dt > wk2_end:
+            out_of_period.add(dt.strftime("%Y-%m-%d"))
+    return sorted(out_of_period), invalid
+
+
+@app.route("/api/preview-overtime", methods=["POST"])
+def preview_overtime():
+    """Dry run of generate-overtime: week totals and validation only, no PDF/Excel."""
+    data = request.get_json()
+    employees_all = data.get("employees", [])
+    pp_end = data.get("payPeriodEnd", "")
+    ot_entries = data.get("otEntries", {})  # keyed by emp_no
+
+    if not pp_end:
+        return jsonify({"error": "Missing pay period end date"}), 400
+    try:
+        (wk1_start, wk1_end), (wk2_start, wk2_end) = pay_period_weeks(pp_end)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    cat_keys = ("ot10", "ot15", "cte10", "cte15")
+    emps_with_ot = _collect_employees_with_ot(employees_all, ot_entries)
+    matched = {item["employee"].get("emp_no", "") for item in emps_with_ot}
+
+    rows = []
+    out_of_period = []
+    invalid = []
+    cat_totals = dict.fromkeys(cat_keys, 0.0)
+    grand_total = 0.0
+    for item in emps_with_ot:
+        emp = item["employee"]
+        ot_data = item["ot_data"]
+        emp_no = str(emp.get("emp_no", "") or "").strip()
+        weeks = _aggregate_ot_by_week(ot_data, wk1_start, wk1_end, wk2_start, wk2_end)
+
+        week_rows = []
+        for week_idx, w in enumerate(weeks, 1):
+            row = {"week": week_idx, "dates": w["dates_str"], "total": round(w["row_total"], 2)}
+            for ck in cat_keys:
+                row[ck] = round(w[ck], 2)
+                cat_totals[ck] += w[ck]
+            week_rows.append(row)
+        emp_total = sum(w["row_total"] for w in weeks)
+        grand_total += emp_total
+
+        rows.append({
+            "empNo": emp_no,
+            "name": f"{emp.get('last', '')}, {emp.get('first', '')}".strip(", ").strip(),
+            "weeks": week_rows,
+            "total": round(emp_total, 2),
+        })
+        dates, bad_entries = _check_entries(ot_data, wk1_start, wk2_end)
+        out_of_period.extend({"empNo": emp_no, "date": d} for d in dates)
+        invalid.extend(dict(bad, empNo=emp_no) for bad in bad_entries)
+
+    # OT keyed to someone missing from the roster never reaches a slip; __UM__
+    # rows are import names that matched no one and print without an emp #.
+    unmatched = []
+    for emp_no, bundle in ot_entries.items():
+        if not (bundle or {}).get("entries") and not (bundle or {}).get("weekBlocks"):
+            continue
+        if emp_no.startswith("__UM__") or emp_no not in matched:
+            unmatched.append(emp_no[len("__UM__"):].replace("|", ", ") if emp_no.startswith("__UM__") else emp_no)
+
+    return jsonify({
+        "employees": rows,
+        "categoryTotals": {ck: round(v, 2) for ck, v in cat_totals.items()},
+        "grandTotal": round(grand_total, 2),
+        "outOfPeriod": out_of_period,
+        "invalid": invalid,
+        "unmatched": unmatched,
     })
 
 
+@app.route("/api/generate-bundle", methods=["POST"])
+@admission_controlled(_roster_estimator(BUNDLE_SLIP_COST_MB, BUNDLE_BASE_COST_MB))
+def generate_bundle():
+    """Stream a ZIP with the OT binder, per-employee slips and Excel summary."""
+    data = request.get_json()
+    employees_all = data.get("employees", [])
+    pp_end = data.get("payPeriodEnd", "")
+    ot_entries = data.get("otEntries", {})  # keyed by emp_no
+
+    if not pp_end:
+        return jsonify({"error": "Missing pay period end date"}), 400
+
+    try:
+        template = get_template(data.get("template"))
+        end_dt = parse_date_flexible(pp_end)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    deterministic = DETERMINISTIC_OUTPUT or bool(data.get("deterministic"))
+
+    emps_with_ot = _collect_employees_with_ot(employees_all, ot_entries)
+    if not emps_with_ot:
+        return jsonify({"error": "No overtime entries found"}), 400
+
+    return Response(
+        stream_with_context(stream_ot_bundle(emps_with_ot, pp_end, template, deterministic)),
+        mimetype="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename=Overtime_Bundle_{end_dt.strftime('%m-%d-%y')}.zip",
+        },
+    )
+
+
 if __name__ == "__main__":
     app.run(debug=True, port=5050)
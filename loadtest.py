@@ -0,0 +1,351 @@
+"""
+Concurrent-clerk load test for the slip tool.
+
+Launches the app under gunicorn locally for each worker configuration, has a
+handful of simulated clerks hit the API at once (like the end of a pay
+period), and prints latency percentiles, throughput and per-worker memory.
+
+    python loadtest.py
+    python loadtest.py --clerks 6 --duration 60 --configs sync:2,gthread:2x4,sync:4
+    python loadtest.py --mix parse=1,import=1,slips=1,overtime=3 --roster 200
+    python loadtest.py --env OT_CPU_SLOTS=4 --env OT_MEMORY_BUDGET_MB=768
+
+Config format is worker_class:workers or worker_class:workersxthreads.
+Per-worker RSS is read from /proc, so memory numbers are Linux-only.
+"""
+import os
+import io
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+from openpyxl import Workbook
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS = {
+    "parse": "/api/parse-csv",
+    "import": "/api/import-corrections",
+    "slips": "/api/generate-slips",
+    "overtime": "/api/generate-overtime",
+}
+CATS = ["ot10", "ot15", "cte10", "cte15"]
+
+# ---------------------------------------------------------------------------
+# Synthetic pay period data
+# ---------------------------------------------------------------------------
+
+def last_saturday() -> datetime:
+    d = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return d - timedelta(days=(d.weekday() - 5) % 7)
+
+
+def make_roster(n: int) -> list:
+    return [{"last": f"Clerk{i:04d}", "first": f"Test{i % 37}", "emp_no": f"{10000 + i}"} for i in range(n)]
+
+
+def make_csv(roster: list) -> bytes:
+    lines = ["LastName,FirstName,EmployeeNumber"]
+    lines += [f"{e['last']},{e['first']},{e['emp_no']}" for e in roster]
+    return "\n".join(lines).encode()
+
+
+def make_ot_entries(roster: list, n_with_ot: int, pp_end: datetime, rng: random.Random) -> dict:
+    start = pp_end - timedelta(days=13)
+    ot = {}
+    for emp in rng.sample(roster, min(n_with_ot, len(roster))):
+        entries = []
+        for _ in range(rng.randint(2, 8)):
+            day = start + timedelta(days=rng.randint(0, 13))
+            entries.append({"date": day.strftime("%Y-%m-%d"), "category": rng.choice(CATS),
+                            "hours": round(rng.uniform(0.5, 4), 2)})
+        ot[emp["emp_no"]] = {"entries": entries, "weekBlocks": []}
+    return ot
+
+
+def make_corrections_xlsx(roster: list, n_rows: int, pp_end: datetime, rng: random.Random) -> bytes:
+    """OPS CORRECTIONS layout: data from row 9; Name(C), Date(E), type(I), Diff(O), Note(Q)."""
+    wb = Workbook()
+    ws = wb.active
+    start = pp_end - timedelta(days=13)
+    for r in range(9, 9 + n_rows):
+        emp = rng.choice(roster)
+        row = [None] * 17
+        row[2] = f"{emp['last']}, {emp['first']}"
+        row[4] = start + timedelta(days=rng.randint(0, 13))
+        row[8] = rng.choice(["OT", "CTE"])
+        row[14] = round(rng.uniform(0.5, 4), 2)
+        row[16] = rng.choice(["1.0", ""])
+        for c, v in enumerate(row, 1):
+            if v is not None:
+                ws.cell(row=r, column=c, value=v)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+def multipart(fields: dict, files: dict) -> tuple:
+    boundary = uuid.uuid4().hex
+    out = io.BytesIO()
+    for name, value in fields.items():
+        out.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode())
+        out.write(str(value).encode() + b"\r\n")
+    for name, (filename, data) in files.items():
+        out.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                  f'filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode())
+        out.write(data + b"\r\n")
+    out.write(f"--{boundary}--\r\n".encode())
+    return out.getvalue(), f"multipart/form-data; boundary={boundary}"
+
+
+def build_requests(args, rng: random.Random) -> dict:
+    """Pre-encode one (body, content_type) per endpoint so clerks only measure the server."""
+    pp_end = last_saturday()
+    pp_str = pp_end.strftime("%Y-%m-%d")
+    roster = make_roster(args.roster)
+
+    csv_body = multipart({}, {"file": ("employees.csv", make_csv(roster))})
+    import_body = multipart(
+        {"employees": json.dumps(roster), "payPeriodEnd": pp_str},
+        {"file": ("corrections.xlsx", make_corrections_xlsx(roster, args.corrections_rows, pp_end, rng))},
+    )
+    slips_body = json.dumps({"employees": roster, "payPeriodEnd": pp_str}).encode()
+    ot_body = json.dumps({
+        "employees": roster, "payPeriodEnd": pp_str,
+        "otEntries": make_ot_entries(roster, args.ot_employees, pp_end, rng),
+    }).encode()
+    return {
+        "parse": csv_body,
+        "import": import_body,
+        "slips": (slips_body, "application/json"),
+        "overtime": (ot_body, "application/json"),
+    }
+
+
+def send(base_url: str, path: str, body: bytes, content_type: str, timeout: float) -> tuple:
+    req = urllib.request.Request(base_url + path, data=body, method="POST",
+                                 headers={"Content-Type": content_type})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, TimeoutError, ConnectionError):
+        status = 0
+    return status, time.perf_counter() - start
+
+
+# ---------------------------------------------------------------------------
+# Gunicorn + memory sampling
+# ---------------------------------------------------------------------------
+
+def parse_config(spec: str) -> tuple:
+    worker_class, _, size = spec.partition(":")
+    workers, _, threads = size.partition("x")
+    return worker_class, int(workers or 2), int(threads or 1)
+
+
+def launch_gunicorn(spec: str, port: int, ledger_path: str, extra_env: dict) -> subprocess.Popen:
+    worker_class, workers, threads = parse_config(spec)
+    cmd = [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}",
+           "--workers", str(workers), "--worker-class", worker_class,
+           "--threads", str(threads), "--timeout", "180", "app:app"]
+    env = dict(os.environ, OT_WORKER_SLOTS=str(workers * threads))
+    env.update(extra_env, OT_ADMISSION_LEDGER=ledger_path)
+    proc = subprocess.Popen(cmd, cwd=APP_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/queue", timeout=1).read()
+            return proc
+        except (urllib.error.URLError, ConnectionError):
+            if proc.poll() is not None:
+                break
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"gunicorn ({spec}) did not come up on port {port}")
+
+
+def worker_pids(master_pid: int) -> list:
+    pids = []
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                # ppid is the 4th field, after the parenthesised command name
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == master_pid:
+            pids.append(int(name))
+    return sorted(pids)
+
+
+def rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def sample_rss(master_pid: int, peaks: dict, stop: threading.Event):
+    while not stop.is_set():
+        for pid in worker_pids(master_pid):
+            peaks[pid] = max(peaks.get(pid, 0.0), rss_mb(pid))
+        stop.wait(0.25)
+
+
+# ---------------------------------------------------------------------------
+# Run
+# ---------------------------------------------------------------------------
+
+def percentile(sorted_vals: list, pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    # Nearest rank: the smallest value with at least pct% of samples at or below it
+    idx = min(len(sorted_vals) - 1, max(0, math.ceil(pct / 100 * len(sorted_vals)) - 1))
+    return sorted_vals[idx]
+
+
+def run_config(spec: str, args, bodies: dict, mix: list, port: int) -> dict:
+    ledger = os.path.join(tempfile.gettempdir(), f"ot_loadtest_{port}.json")
+    proc = launch_gunicorn(spec, port, ledger, args.env)
+    base_url = f"http://127.0.0.1:{port}"
+    results = []
+    lock = threading.Lock()
+    peaks = {}
+    stop = threading.Event()
+    sampler = threading.Thread(target=sample_rss, args=(proc.pid, peaks, stop), daemon=True)
+    sampler.start()
+
+    def clerk(seed: int):
+        rng = random.Random(seed)
+        deadline = time.monotonic() + args.duration
+        while time.monotonic() < deadline:
+            kind = rng.choice(mix)
+            body, content_type = bodies[kind]
+            status, elapsed = send(base_url, ENDPOINTS[kind], body, content_type, args.timeout)
+            with lock:
+                results.append((kind, status, elapsed))
+            time.sleep(rng.uniform(0, args.think))
+
+    try:
+        started = time.perf_counter()
+        clerks = [threading.Thread(target=clerk, args=(args.seed + i,)) for i in range(args.clerks)]
+        for t in clerks:
+            t.start()
+        for t in clerks:
+            t.join()
+        wall = time.perf_counter() - started
+    finally:
+        stop.set()
+        sampler.join()
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        if os.path.exists(ledger):
+            os.remove(ledger)
+
+    return {"spec": spec, "results": results, "wall": wall, "rss": peaks}
+
+
+def report(run: dict):
+    print(f"\n=== {run['spec']} ===")
+    print(f"{'endpoint':<10} {'ok':>5} {'429':>5} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    kinds = [k for k in ENDPOINTS if any(r[0] == k for r in run["results"])] + ["ALL"]
+    for kind in kinds:
+        rows = [r for r in run["results"] if kind == "ALL" or r[0] == kind]
+        ok = sorted(r[2] * 1000 for r in rows if 200 <= r[1] < 300)
+        busy = sum(1 for r in rows if r[1] == 429)
+        err = len(rows) - len(ok) - busy
+        print(f"{kind:<10} {len(ok):>5} {busy:>5} {err:>5} "
+              f"{percentile(ok, 50):>9.0f} {percentile(ok, 95):>9.0f} {percentile(ok, 99):>9.0f}")
+    ok_total = sum(1 for r in run["results"] if 200 <= r[1] < 300)
+    print(f"throughput: {ok_total / run['wall']:.2f} req/s over {run['wall']:.1f}s")
+    if run["rss"]:
+        per_worker = ", ".join(f"{mb:.0f}" for mb in run["rss"].values())
+        print(f"peak RSS per worker (MB): {per_worker}  (sum {sum(run['rss'].values()):.0f})")
+
+
+def compare(runs: list):
+    print("\n=== comparison ===")
+    print(f"{'config':<14} {'req/s':>7} {'p95 ms':>9} {'p99 ms':>9} {'429s':>6} {'RSS sum MB':>11}")
+    for run in runs:
+        ok = sorted(r[2] * 1000 for r in run["results"] if 200 <= r[1] < 300)
+        busy = sum(1 for r in run["results"] if r[1] == 429)
+        print(f"{run['spec']:<14} {len(ok) / run['wall']:>7.2f} {percentile(ok, 95):>9.0f} "
+              f"{percentile(ok, 99):>9.0f} {busy:>6} {sum(run['rss'].values()):>11.0f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--configs", default="sync:2,gthread:2x4,sync:4,gthread:4x4",
+                    help="comma-separated worker_class:workers[xthreads]; sync:2 is the Dockerfile setup")
+    ap.add_argument("--clerks", type=int, default=4, help="simulated clerks hitting the app at once")
+    ap.add_argument("--duration", type=float, default=30, help="seconds per config")
+    ap.add_argument("--mix", default="parse=1,import=1,slips=1,overtime=2",
+                    help="relative weight of each endpoint")
+    ap.add_argument("--roster", type=int, default=128, help="employees on the roster")
+    ap.add_argument("--ot-employees", type=int, default=30, help="employees with OT")
+    ap.add_argument("--corrections-rows", type=int, default=150, help="rows in the corrections sheet")
+    ap.add_argument("--think", type=float, default=0.5, help="max random pause between a clerk's requests (s)")
+    ap.add_argument("--timeout", type=float, default=180, help="per-request timeout (s)")
+    ap.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                    help="extra environment for the app, e.g. admission limits (repeatable)")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--seed", type=int, default=107)
+    args = ap.parse_args()
+
+    mix = []
+    for item in args.mix.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ENDPOINTS:
+            ap.error(f"unknown endpoint in --mix: {name} (choose from {', '.join(ENDPOINTS)})")
+        mix += [name.strip()] * int(weight or 1)
+
+    env = {}
+    for item in args.env:
+        key, sep, value = item.partition("=")
+        if not sep:
+            ap.error(f"--env expects KEY=VALUE, got {item}")
+        env[key] = value
+    args.env = env
+
+    bodies = build_requests(args, random.Random(args.seed))
+
+    runs = []
+    for i, spec in enumerate(s.strip() for s in args.configs.split(",") if s.strip()):
+        print(f"running {spec} with {args.clerks} clerks for {args.duration:.0f}s...", flush=True)
+        run = run_config(spec, args, bodies, mix, args.port + i)
+        report(run)
+        runs.append(run)
+    if len(runs) > 1:
+        compare(runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 (() => {
     "use strict";
 
-    const STORAGE_KEY = "montebello_ot_state";
+    // /?bench runs static/bench.js against its own saved session, never the clerk's
+    const STORAGE_KEY = /[?&]bench=/.test(location.search) ? "montebello_ot_bench" : "montebello_ot_state";
     const THEME_KEY = "app_theme";
     const CAT_LABELS = { ot10: "OT 1.0", ot15: "OT 1.5", cte10: "CTE 1.0", cte15: "CTE 1.5" };
     const CATS = ["ot10", "ot15", "cte10", "cte15"];
@@ -77,8 +78,58 @@
     let state = { employees: [], payPeriodEnd: "", otEntries: [] };
     let activeEmpNo = null;
 
-    function saveState() {
-        localStorage.setItem(STORAGE_KEY, JSON.stringify(state));
+    // OT entries are stored per employee (one localStorage key each) so an
+    // edit only rewrites that employee's slice. Writes are debounced and
+    // flushed when the page is hidden.
+    const ENTRY_KEY_PREFIX = STORAGE_KEY + ":emp:";
+    const ENTRY_INDEX_KEY = STORAGE_KEY + ":emps";
+    const SAVE_DELAY_MS = 250;
+    const dirtyEmps = new Set();
+    const persistedEmps = new Set();
+    let metaDirty = false;
+    let saveTimer = null;
+
+    // saveState() saves the employee list + pay period; saveState(empNo)
+    // saves one employee's entries.
+    function saveState(empNo) {
+        if (empNo === undefined) metaDirty = true;
+        else dirtyEmps.add(empNo);
+        clearTimeout(saveTimer);
+        saveTimer = setTimeout(flushState, SAVE_DELAY_MS);
+    }
+    function saveAllState() {
+        persistedEmps.forEach(empNo => dirtyEmps.add(empNo));
+        state.otEntries.forEach(e => dirtyEmps.add(e.empNo));
+        saveState();
+    }
+    function flushState() {
+        clearTimeout(saveTimer);
+        saveTimer = null;
+        try {
+            if (metaDirty) {
+                localStorage.setItem(STORAGE_KEY, JSON.stringify({
+                    employees: state.employees, payPeriodEnd: state.payPeriodEnd,
+                }));
+                metaDirty = false;
+            }
+            if (dirtyEmps.size) {
+                const byEmp = {};
+                state.otEntries.forEach(e => {
+                    if (dirtyEmps.has(e.empNo)) (byEmp[e.empNo] = byEmp[e.empNo] || []).push(e);
+                });
+                dirtyEmps.forEach(empNo => {
+                    if (byEmp[empNo]) {
+                        localStorage.setItem(ENTRY_KEY_PREFIX + empNo, JSON.stringify(byEmp[empNo]));
+                        persistedEmps.add(empNo);
+                    } else {
+                        localStorage.removeItem(ENTRY_KEY_PREFIX + empNo);
+                        persistedEmps.delete(empNo);
+                    }
+                });
+                dirtyEmps.clear();
+                localStorage.setItem(ENTRY_INDEX_KEY, JSON.stringify([...persistedEmps]));
+            }
+        } catch (_) {}
     }
     function loadState() {
         try {
@@ -86,10 +137,27 @@
             if (s) {
                 state.employees = s.employees || [];
                 state.payPeriodEnd = s.payPeriodEnd || "";
-                state.otEntries = s.otEntries || [];
+            }
+            const index = JSON.parse(localStorage.getItem(ENTRY_INDEX_KEY)) || [];
+            index.forEach(empNo => {
+                const list = JSON.parse(localStorage.getItem(ENTRY_KEY_PREFIX + empNo));
+                if (Array.isArray(list) && list.length) {
+                    list.forEach(e => state.otEntries.push(e));
+                    persistedEmps.add(empNo);
+                }
+            });
+            // Older saves kept every entry inside the main blob — split them out once
+            if (s && Array.isArray(s.otEntries) && s.otEntries.length) {
+                s.otEntries.forEach(e => state.otEntries.push(e));
+                saveAllState();
+                flushState();
             }
         } catch (_) {}
     }
+    window.addEventListener("pagehide", flushState);
+    document.addEventListener("visibilitychange", () => {
+        if (document.visibilityState === "hidden") flushState();
+    });
 
     // -----------------------------------------------------------------------
     // DOM
@@ -121,12 +189,15 @@
     const $otCards = $("ot-cards");
     const $otEntryCount = $("ot-entry-count");
     const $otSummaryWrap = $("ot-summary-wrap");
-    const $otSummaryBody = $("ot-summary-body");
+    const $otSummaryTable = $("ot-summary-table");
+    const $otSummaryFoot = $("ot-summary-foot");
     const $wk1Range = $("wk1-range");
     const $wk2Range = $("wk2-range");
     const $otWeekInfo = $("ot-week-info");
 
     const $btnGenerateOt = $("btn-generate-ot");
+    const $btnGenerateBundle = $("btn-generate-bundle");
+    const $otSummaryFormat = $("ot-summary-format");
     const $btnClearSession = $("btn-clear-session");
     const $otStatus = $("ot-status");
     const $activeCardStatus = $("active-card-status");
@@ -229,10 +300,6 @@
         return "?";
     }
 
-    function uniqueEmpCount() {
-        return new Set(state.otEntries.map(e => e.empNo)).size;
-    }
-
     // -----------------------------------------------------------------------
     // Tabs
     // -----------------------------------------------------------------------
@@ -479,8 +546,9 @@
         });
         comboHighlight = -1;
 
+        const empsWithEntries = new Set(state.otEntries.map(e => e.empNo));
         $empList.innerHTML = filteredEmps.slice(0, 50).map((emp, i) => {
-            const hasEntries = state.otEntries.some(e => e.empNo === emp.emp_no);
+            const hasEntries = empsWithEntries.has(emp.emp_no);
             const checkmark = hasEntries ? '<span class="emp-done">&#10003;</span>' : '';
             return `<div class="combobox-item" data-idx="${i}">` +
                 `${checkmark}${emp.last}, ${emp.first} <span class="emp-num">#${emp.emp_no}</span></div>`;
@@ -536,6 +604,7 @@
     }
 
     function closeActiveCard() {
+        const prevEmpNo = activeEmpNo;
         activeEmpNo = null;
         $empSelectedNo.value = "";
         $empSearch.value = "";
@@ -544,7 +613,7 @@
         $otHours.value = "";
         resetWeekBlockForm();
         hideStatus($activeCardStatus);
-        renderCompletedCards();
+        if (prevEmpNo) renderEmps([prevEmpNo]);
         $empSearch.focus();
     }
 
@@ -637,6 +706,7 @@
         $btnGenerateSlips.disabled = !ready;
         setOtControlsEnabled(!!ready);
         $btnGenerateOt.disabled = !(ready && state.otEntries.length > 0);
+        $btnGenerateBundle.disabled = $btnGenerateOt.disabled;
         $btnClearSession.disabled = state.otEntries.length === 0;
         if ($btnImportParse && $importCorrections && $importCorrections.files[0]) {
             $btnImportParse.disabled = !ready;
@@ -686,11 +756,10 @@
             ot10: round2(ot10), ot15: round2(ot15), cte10: round2(cte10), cte15: round2(cte15),
         });
 
-        saveState();
+        saveState(empNo);
         hideStatus($activeCardStatus);
         renderActiveEntries();
-        renderCompletedCards();
-        renderSummary();
+        renderEmps([empNo]);
         updateButtonStates();
 
         resetWeekBlockForm();
@@ -715,11 +784,10 @@
             date, category, hours: hrs,
         });
 
-        saveState();
+        saveState(empNo);
         hideStatus($activeCardStatus);
         renderActiveEntries();
-        renderCompletedCards();
-        renderSummary();
+        renderEmps([empNo]);
         updateButtonStates();
 
         $otHours.value = "";
@@ -730,87 +798,118 @@
     // Undo / remove
     // -----------------------------------------------------------------------
     function removeEntry(idx) {
-        state.otEntries.splice(idx, 1);
-        saveState();
-        renderCompletedCards();
-        renderSummary();
+        const [removed] = state.otEntries.splice(idx, 1);
+        if (!removed) return;
+        saveState(removed.empNo);
+        renderEmps([removed.empNo]);
         updateButtonStates();
     }
 
     // -----------------------------------------------------------------------
     // Render
     // -----------------------------------------------------------------------
+    // Cards and summary rows are kept per employee; an edit re-renders only
+    // the employees it touched, then the badge and grand total.
+    const cardEls = new Map();      // empNo -> .completed-row
+    const summaryEls = new Map();   // empNo -> <tbody> with that employee's 3 rows
+    const summaryTotals = new Map(); // empNo -> employee total hours
+
     function renderAll() {
         if (activeEmpNo) renderActiveEntries();
-        renderCompletedCards();
-        renderSummary();
+        cardEls.forEach(el => el.remove());
+        summaryEls.forEach(el => el.remove());
+        cardEls.clear();
+        summaryEls.clear();
+        summaryTotals.clear();
+        renderEmps(new Set(state.otEntries.map(e => e.empNo)));
     }
 
-    function renderCompletedCards() {
+    function renderEmps(empNos) {
+        const wanted = new Set(empNos);
         const groups = {};
-        state.otEntries.forEach((e, idx) => {
-            if (!groups[e.empNo]) groups[e.empNo] = { emp: e, entries: [], totalHrs: 0 };
-            groups[e.empNo].entries.push({ ...e, _idx: idx });
-            groups[e.empNo].totalHrs += entryHours(e);
+        state.otEntries.forEach(e => {
+            if (!wanted.has(e.empNo)) return;
+            if (!groups[e.empNo]) groups[e.empNo] = [];
+            groups[e.empNo].push(e);
+        });
+        wanted.forEach(empNo => {
+            renderCard(empNo, groups[empNo]);
+            renderSummaryRows(empNo, groups[empNo]);
         });
+        renderTotals();
+    }
 
-        const sorted = Object.values(groups).sort((a, b) =>
-            `${a.emp.last}${a.emp.first}`.localeCompare(`${b.emp.last}${b.emp.first}`)
-        );
+    function placeSorted(parent, el, key, endNode) {
+        el.dataset.sortkey = key;
+        let ref = endNode || null;
+        for (const child of parent.children) {
+            if (child === el || child === endNode || !child.dataset.sortkey) continue;
+            if (child.dataset.sortkey.localeCompare(key) > 0) { ref = child; break; }
+        }
+        parent.insertBefore(el, ref);
+    }
 
-        if (sorted.length === 0) {
-            $otCardsWrap.classList.add("hidden");
-            $otSummaryWrap.classList.add("hidden");
+    function renderCard(empNo, entries) {
+        let el = cardEls.get(empNo);
+        if (!entries || entries.length === 0) {
+            if (el) { el.remove(); cardEls.delete(empNo); }
             return;
         }
-
-        $otCardsWrap.classList.remove("hidden");
-        $otSummaryWrap.classList.remove("hidden");
-        $otEntryCount.textContent = uniqueEmpCount();
-
-        $otCards.innerHTML = sorted.map(g => {
-            const isActive = g.emp.empNo === activeEmpNo;
-            return `<div class="completed-row ${isActive ? 'active-highlight' : ''}" data-empno="${g.emp.empNo}">
-                <div class="completed-row-header">
-                    <span class="completed-name">${g.emp.last}, ${g.emp.first}</span>
-                    <span class="completed-meta">
-                        #${g.emp.empNo} &middot; ${g.entries.length} entries &middot; ${Number(g.totalHrs).toFixed(2)} hrs
-                    </span>
-                    <button class="btn-edit-emp btn-small btn-ghost" data-empno="${g.emp.empNo}">Edit</button>
-                </div>
+        const emp = entries[0];
+        const totalHrs = entries.reduce((s, e) => s + entryHours(e), 0);
+        const isNew = !el;
+        if (isNew) {
+            el = document.createElement("div");
+            el.dataset.empno = empNo;
+            cardEls.set(empNo, el);
+        }
+        el.className = `completed-row ${empNo === activeEmpNo ? 'active-highlight' : ''}`;
+        el.innerHTML = `<div class="completed-row-header">
+                <span class="completed-name">${emp.last}, ${emp.first}</span>
+                <span class="completed-meta">
+                    #${emp.empNo} &middot; ${entries.length} entries &middot; ${Number(totalHrs).toFixed(2)} hrs
+                </span>
+                <button class="btn-edit-emp btn-small btn-ghost" data-empno="${emp.empNo}">Edit</button>
             </div>`;
-        }).join("");
+        if (isNew) placeSorted($otCards, el, `${emp.last}${emp.first}`);
+    }
 
-        $otCards.querySelectorAll(".btn-edit-emp").forEach(btn => {
-            btn.addEventListener("click", () => {
-                const empNo = btn.dataset.empno;
-                const emp = state.employees.find(e => e.emp_no === empNo);
-                if (emp) selectEmployee(emp);
-            });
-        });
+    $otCards.addEventListener("click", (e) => {
+        const btn = e.target.closest(".btn-edit-emp");
+        if (!btn) return;
+        const emp = state.employees.find(x => x.emp_no === btn.dataset.empno);
+        if (emp) selectEmployee(emp);
+    });
+
+    function fmtDatesSet(dateSet) {
+        if (dateSet.size === 0) return "";
+        const sorted = [...dateSet].sort();
+        return sorted.map(ds => {
+            const d = new Date(ds + "T00:00:00");
+            return fmtShort(d);
+        }).join(", ");
     }
 
-    function renderSummary() {
-        if (state.otEntries.length === 0) {
-            $otSummaryWrap.classList.add("hidden");
+    function renderSummaryRows(empNo, entries) {
+        let tbody = summaryEls.get(empNo);
+        if (!entries || entries.length === 0) {
+            if (tbody) { tbody.remove(); summaryEls.delete(empNo); }
+            summaryTotals.delete(empNo);
             return;
         }
-        $otSummaryWrap.classList.remove("hidden");
 
-        const byEmp = {};
-        state.otEntries.forEach(e => {
-            if (!byEmp[e.empNo]) {
-                byEmp[e.empNo] = {
-                    last: e.last, first: e.first, empNo: e.empNo,
-                    wk: {
-                        1: { cats: {}, dates: new Set(), ranges: [] },
-                        2: { cats: {}, dates: new Set(), ranges: [] },
-                    },
-                };
-            }
+        const first = entries[0];
+        const emp = {
+            last: first.last, first: first.first, empNo,
+            wk: {
+                1: { cats: {}, dates: new Set(), ranges: [] },
+                2: { cats: {}, dates: new Set(), ranges: [] },
+            },
+        };
+        entries.forEach(e => {
             if (e.kind === "weekBlock") {
                 const wn = e.week === 2 || e.week === "2" ? 2 : 1;
-                const w = byEmp[e.empNo].wk[wn];
+                const w = emp.wk[wn];
                 CATS.forEach(c => {
                     const v = Number(e[c]) || 0;
                     if (v > 0) w.cats[c] = (w.cats[c] || 0) + v;
@@ -819,57 +918,44 @@
             } else {
                 const week = dateToWeek(e.date, state.payPeriodEnd);
                 if (week === "1" || week === "2") {
-                    const w = byEmp[e.empNo].wk[week];
+                    const w = emp.wk[week];
                     w.cats[e.category] = (w.cats[e.category] || 0) + e.hours;
                     w.dates.add(e.date);
                 }
             }
         });
 
-        const empList = Object.values(byEmp).sort((a, b) =>
-            `${a.last}${a.first}`.localeCompare(`${b.last}${b.first}`)
-        );
+        let empTotal = 0;
 
-        function fmtDatesSet(dateSet) {
-            if (dateSet.size === 0) return "";
-            const sorted = [...dateSet].sort();
-            return sorted.map(ds => {
-                const d = new Date(ds + "T00:00:00");
-                return fmtShort(d);
-            }).join(", ");
-        }
+        const wk1Dates = fmtDatesSet(emp.wk["1"].dates);
+        const wk1Ranges = emp.wk["1"].ranges.length ? emp.wk["1"].ranges.join("; ") : "";
+        let wk1Total = 0;
+        const wk1Cells = CATS.map(c => {
+            const v = emp.wk["1"].cats[c] || 0; wk1Total += v;
+            return `<td>${v ? Number(v).toFixed(2) : ""}</td>`;
+        }).join("");
+        empTotal += wk1Total;
+
+        const wk2Dates = fmtDatesSet(emp.wk["2"].dates);
+        const wk2Ranges = emp.wk["2"].ranges.length ? emp.wk["2"].ranges.join("; ") : "";
+        let wk2Total = 0;
+        const wk2Cells = CATS.map(c => {
+            const v = emp.wk["2"].cats[c] || 0; wk2Total += v;
+            return `<td>${v ? Number(v).toFixed(2) : ""}</td>`;
+        }).join("");
+        empTotal += wk2Total;
 
-        let html = "";
-        let grandTotal = 0;
+        const wk1LabelText = [wk1Dates, wk1Ranges].filter(Boolean).join("; ");
+        const wk2LabelText = [wk2Dates, wk2Ranges].filter(Boolean).join("; ");
+        const wk1Label = wk1LabelText ? `Wk 1: ${wk1LabelText}` : "Wk 1";
+        const wk2Label = wk2LabelText ? `Wk 2: ${wk2LabelText}` : "Wk 2";
 
-        empList.forEach(emp => {
-            let empTotal = 0;
-
-            const wk1Dates = fmtDatesSet(emp.wk["1"].dates);
-            const wk1Ranges = emp.wk["1"].ranges.length ? emp.wk["1"].ranges.join("; ") : "";
-            let wk1Total = 0;
-            const wk1Cells = CATS.map(c => {
-                const v = emp.wk["1"].cats[c] || 0; wk1Total += v;
-                return `<td>${v ? Number(v).toFixed(2) : ""}</td>`;
-            }).join("");
-            empTotal += wk1Total;
-
-            const wk2Dates = fmtDatesSet(emp.wk["2"].dates);
-            const wk2Ranges = emp.wk["2"].ranges.length ? emp.wk["2"].ranges.join("; ") : "";
-            let wk2Total = 0;
-            const wk2Cells = CATS.map(c => {
-                const v = emp.wk["2"].cats[c] || 0; wk2Total += v;
-                return `<td>${v ? Number(v).toFixed(2) : ""}</td>`;
-            }).join("");
-            empTotal += wk2Total;
-            grandTotal += empTotal;
-
-            const wk1LabelText = [wk1Dates, wk1Ranges].filter(Boolean).join("; ");
-            const wk2LabelText = [wk2Dates, wk2Ranges].filter(Boolean).join("; ");
-            const wk1Label = wk1LabelText ? `Wk 1: ${wk1LabelText}` : "Wk 1";
-            const wk2Label = wk2LabelText ? `Wk 2: ${wk2LabelText}` : "Wk 2";
-
-            html += `<tr>
+        const isNew = !tbody;
+        if (isNew) {
+            tbody = document.createElement("tbody");
+            summaryEls.set(empNo, tbody);
+        }
+        tbody.innerHTML = `<tr>
                 <td class="emp-name-cell" rowspan="2">${emp.last}, ${emp.first}<br><span style="font-size:0.78rem;color:var(--text-muted)">#${emp.empNo}</span></td>
                 <td class="wk-label">${wk1Label}</td>${wk1Cells}
                 <td>${wk1Total ? Number(wk1Total).toFixed(2) : ""}</td>
@@ -880,14 +966,26 @@
             <tr><td colspan="7" class="emp-total-cell" style="text-align:right;padding-right:1rem;">
                 Employee Total: <strong>${Number(empTotal).toFixed(2)}</strong>
             </td></tr>`;
-        });
+        if (isNew) placeSorted($otSummaryTable, tbody, `${emp.last}${emp.first}`, $otSummaryFoot);
+        summaryTotals.set(empNo, empTotal);
+    }
 
-        html += `<tr class="grand-total">
+    function renderTotals() {
+        if (cardEls.size === 0) {
+            $otCardsWrap.classList.add("hidden");
+            $otSummaryWrap.classList.add("hidden");
+            return;
+        }
+        $otCardsWrap.classList.remove("hidden");
+        $otSummaryWrap.classList.remove("hidden");
+        $otEntryCount.textContent = cardEls.size;
+
+        let grandTotal = 0;
+        summaryTotals.forEach(v => { grandTotal += v; });
+        $otSummaryFoot.innerHTML = `<tr class="grand-total">
             <td colspan="6" style="text-align:right;padding-right:1rem;">GRAND TOTAL</td>
             <td><strong>${Number(grandTotal).toFixed(2)}</strong></td>
         </tr>`;
-
-        $otSummaryBody.innerHTML = html;
     }
 
     // -----------------------------------------------------------------------
@@ -933,7 +1031,10 @@
             const resp = await fetch("/api/generate-overtime", {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ employees: state.employees, payPeriodEnd: state.payPeriodEnd, otEntries: otByEmp }),
+                body: JSON.stringify({
+                    employees: state.employees, payPeriodEnd: state.payPeriodEnd, otEntries: otByEmp,
+                    summaryFormat: $otSummaryFormat.value,
+                }),
                 signal: ctrl2.signal,
             });
             clearTimeout(t2);
@@ -943,11 +1044,43 @@
             const pdfBytes = Uint8Array.from(atob(data.pdf), c => c.charCodeAt(0));
             downloadBlob(new Blob([pdfBytes], { type: "application/pdf" }), data.pdfFilename);
 
-            const xlBytes = Uint8Array.from(atob(data.excel), c => c.charCodeAt(0));
-            downloadBlob(new Blob([xlBytes], { type: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet" }), data.excelFilename);
+            const summaryBytes = Uint8Array.from(atob(data.summary), c => c.charCodeAt(0));
+            downloadBlob(new Blob([summaryBytes], { type: data.summaryMimetype }), data.summaryFilename);
 
             stopElapsedTimer($otStatus);
-            showStatus($otStatus, "OT slips PDF and Excel summary downloaded.", "success");
+            showStatus($otStatus, `OT slips PDF and ${data.summaryFilename} downloaded.`, "success");
+        } catch (err) {
+            stopElapsedTimer($otStatus);
+            const msg = err.name === "AbortError" ? "Request timed out — try again, it may take a moment." : err.message;
+            showStatus($otStatus, "Error: " + msg, "error");
+        } finally { updateButtonStates(); }
+    });
+
+    // -----------------------------------------------------------------------
+    // Download ZIP bundle (binder + per-employee slips + Excel)
+    // -----------------------------------------------------------------------
+    $btnGenerateBundle.addEventListener("click", async () => {
+        startElapsedTimer($otStatus, "Building ZIP bundle...");
+        $btnGenerateBundle.disabled = true;
+        $btnGenerateOt.disabled = true;
+
+        const otByEmp = buildOtPayloadFromEntries();
+
+        try {
+            const ctrl3 = new AbortController();
+            const t3 = setTimeout(() => ctrl3.abort(), 120000);
+            const resp = await fetch("/api/generate-bundle", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ employees: state.employees, payPeriodEnd: state.payPeriodEnd, otEntries: otByEmp }),
+                signal: ctrl3.signal,
+            });
+            if (!resp.ok) { clearTimeout(t3); const err = await resp.json(); throw new Error(err.error || "Server error"); }
+            const blob = await resp.blob();
+            clearTimeout(t3);
+            downloadBlob(blob, resp.headers.get("Content-Disposition")?.split("filename=")[1] || "bundle.zip");
+            stopElapsedTimer($otStatus);
+            showStatus($otStatus, "ZIP bundle downloaded.", "success");
         } catch (err) {
             stopElapsedTimer($otStatus);
             const msg = err.name === "AbortError" ? "Request timed out — try again, it may take a moment." : err.message;
@@ -970,7 +1103,7 @@
                 $empSearch.value = "";
                 $empSelectedNo.value = "";
                 $activeOverlay.classList.add("hidden");
-                saveState();
+                saveAllState();
                 updatePayPeriodInfo();
                 renderAll();
                 updateButtonStates();
@@ -1021,7 +1154,6 @@
         updatePayPeriodInfo();
     }
     renderEmployeeState();
-    renderCompletedCards();
-    renderSummary();
+    renderAll();
     updateButtonStates();
 })();
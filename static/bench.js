@@ -0,0 +1,92 @@
+// Scripted Overtime Entry session for timing the entry screen.
+//
+// Open /?bench=1000 to add 1,000 daily entries through the real UI (search,
+// Enter, fill date + hours, click Add, Esc), ~8 per employee. Results are
+// logged to the console. app.js keeps a separate saved session under ?bench
+// (montebello_ot_bench), so a clerk's real entries are never read or
+// touched. Each run clears that session, seeds a synthetic roster of 150
+// and reloads before timing.
+(async () => {
+    "use strict";
+
+    const STORAGE_KEY = "montebello_ot_bench";
+    const SEEDED_FLAG = "montebello_ot_bench_seeded";
+    const PER_EMP = 8;
+    const total = parseInt(new URLSearchParams(location.search).get("bench"), 10) || 1000;
+
+    if (!sessionStorage.getItem(SEEDED_FLAG)) {
+        Object.keys(localStorage).filter(k => k.startsWith(STORAGE_KEY)).forEach(k => localStorage.removeItem(k));
+        const d = new Date();
+        d.setDate(d.getDate() - ((d.getDay() + 1) % 7)); // last Saturday
+        const employees = [];
+        for (let i = 0; i < 150; i++) {
+            employees.push({ last: `Bench${String(i).padStart(3, "0")}`, first: "Clerk", emp_no: String(20000 + i) });
+        }
+        localStorage.setItem(STORAGE_KEY, JSON.stringify({
+            employees, payPeriodEnd: d.toISOString().split("T")[0],
+        }));
+        sessionStorage.setItem(SEEDED_FLAG, "1");
+        location.reload();
+        return;
+    }
+    sessionStorage.removeItem(SEEDED_FLAG);
+    const saved = JSON.parse(localStorage.getItem(STORAGE_KEY));
+
+    const $ = (id) => document.getElementById(id);
+    const key = (el, k) => el.dispatchEvent(new KeyboardEvent("keydown", { key: k, bubbles: true }));
+    const employees = saved.employees;
+    const end = new Date(saved.payPeriodEnd + "T00:00:00");
+    const wk1Start = new Date(end); wk1Start.setDate(end.getDate() - 13);
+
+    const addTimes = [];
+    const started = performance.now();
+    let empIdx = -1;
+
+    for (let i = 0; i < total; i++) {
+        const nextIdx = Math.floor(i / PER_EMP) % employees.length;
+        if (nextIdx !== empIdx) {
+            if (empIdx >= 0) key(document, "Escape");
+            empIdx = nextIdx;
+            const emp = employees[empIdx];
+            const search = $("emp-search");
+            search.value = `${emp.last}, ${emp.first} ${emp.emp_no}`;
+            search.dispatchEvent(new Event("input", { bubbles: true }));
+            key(search, "Enter");
+        }
+        const day = new Date(wk1Start); day.setDate(wk1Start.getDate() + (i % 14));
+        $("ot-date").value = day.toISOString().split("T")[0];
+        $("ot-category").value = ["ot10", "ot15", "cte10", "cte15"][i % 4];
+        $("ot-hours").value = String(1 + (i % 3) * 0.5);
+
+        const t0 = performance.now();
+        $("btn-add-ot").click();
+        addTimes.push(performance.now() - t0);
+
+        // Yield now and then so the browser can paint, like a real clerk would
+        if (i % 50 === 49) await new Promise(r => setTimeout(r, 0));
+    }
+    key(document, "Escape");
+    const entryMs = performance.now() - started;
+
+    // Let the debounced save land, then time how long it took to settle
+    const t1 = performance.now();
+    await new Promise(r => setTimeout(r, 400));
+    const settleMs = performance.now() - t1 - 400;
+
+    addTimes.sort((a, b) => a - b);
+    const pct = (p) => addTimes[Math.min(addTimes.length - 1, Math.ceil(p / 100 * addTimes.length) - 1)];
+    const stored = Object.keys(localStorage)
+        .filter(k => k.startsWith(STORAGE_KEY))
+        .reduce((n, k) => n + localStorage.getItem(k).length, 0);
+
+    console.table({
+        entries: total,
+        "session ms": Math.round(entryMs),
+        "add mean ms": +(addTimes.reduce((a, b) => a + b, 0) / addTimes.length).toFixed(2),
+        "add p50 ms": +pct(50).toFixed(2),
+        "add p95 ms": +pct(95).toFixed(2),
+        "add max ms": +addTimes[addTimes.length - 1].toFixed(2),
+        "save settle ms": Math.max(0, Math.round(settleMs)),
+        "stored chars": stored,
+    });
+})();
@@ -0,0 +1,78 @@
+"""Deterministic mode: the same input must give byte-identical PDFs, Excel
+and ZIP bundles in any process, whatever its hash seed or clock."""
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import zipfile
+
+import pytest
+
+import app
+
+PP_END = "2026-03-28"
+EMPLOYEES = [
+    {"last": "Garcia", "first": "Ana", "emp_no": "10412"},
+    {"last": "Nguyen", "first": "Bao", "emp_no": "10877"},
+    {"last": "Smith", "first": "Jo", "emp_no": "11203"},
+]
+OT_ENTRIES = {
+    "10412": {"entries": [{"date": "2026-03-16", "category": "ot15", "hours": 2}]},
+    "10877": {
+        "entries": [{"date": "2026-03-24", "category": "ot10", "hours": 1.5}],
+        "weekBlocks": [{"week": 1, "rangeText": "3/15-3/17", "cte15": 3}],
+    },
+    "11203": {"entries": [{"date": "2026-03-27", "category": "cte10", "hours": 4}]},
+}
+
+# Rebuilds everything in a fresh interpreter whose clock runs three days ahead
+CHILD = """
+import json, sys, time
+sys.path[:0] = {paths!r}
+_time = time.time
+time.time = lambda: _time() + 3 * 86400
+import test_deterministic
+print(json.dumps(test_deterministic._digests()))
+"""
+
+
+def _digests() -> dict:
+    rows = app._collect_employees_with_ot(EMPLOYEES, OT_ENTRIES)
+    slips = [app.fill_single_pdf(r["employee"], PP_END, r["ot_data"], deterministic=True) for r in rows]
+    outputs = {
+        "slip": slips[0],
+        "binder": app.merge_pdfs(slips, deterministic=True),
+        "excel": app.generate_ot_excel(rows, PP_END, deterministic=True),
+        "bundle": b"".join(app.stream_ot_bundle(rows, PP_END, deterministic=True)),
+    }
+    digests = {name: hashlib.sha256(data).hexdigest() for name, data in outputs.items()}
+    # Default mode stamps ZIP entries with the clock; shows the child's clock moved
+    default_bundle = b"".join(app.stream_ot_bundle(rows[:1], PP_END))
+    digests["clock"] = list(zipfile.ZipFile(io.BytesIO(default_bundle)).infolist()[0].date_time)
+    return digests
+
+
+@pytest.fixture(scope="module")
+def runs():
+    here = os.path.dirname(os.path.abspath(__file__))
+    seed = "3" if os.environ.get("PYTHONHASHSEED") == "2" else "2"
+    child = subprocess.run(
+        [sys.executable, "-c", CHILD.format(paths=[os.path.dirname(here), here])],
+        env=dict(os.environ, PYTHONHASHSEED=seed),
+        capture_output=True, text=True, check=True,
+    )
+    return _digests(), json.loads(child.stdout)
+
+
+@pytest.mark.parametrize("name", ["slip", "binder", "excel", "bundle"])
+def test_output_is_byte_identical(runs, name):
+    here, child = runs
+    assert here[name] == child[name]
+
+
+def test_child_ran_with_a_different_clock(runs):
+    # Guards the test itself: without deterministic mode the timestamps move
+    here, child = runs
+    assert here["clock"] != child["clock"]